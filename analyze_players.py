@@ -8,269 +8,360 @@ Requires Playwright installed and browsers installed:
     python -m playwright install
 
 Outputs:
-- appearances.csv  (player_id, name, competition, raw_cols)
+- appearances.parquet  (player, division, team, matches, ...; appearances.csv too with --export-csv)
 - players_division_stack.png  (stacked bar chart of counts per competition)
+
+Player pages are cached under .cache/players for a day; delete the folder to
+force a fresh scrape. Fetched players are checkpointed to appearances.jsonl so an
+interrupted run resumes where it stopped; the file is removed after a complete run and
+its entries expire after a day like the page cache.
 """
 import os
 import re
+import json
 import time
+import hashlib
+import asyncio
 import argparse
+import httpx
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from playwright.sync_api import sync_playwright
-try:
-    from scrape_playwright import scrape_roster
-except Exception:
-    scrape_roster = None
-
-# try to read trupp_playwright.csv (preferred) else trupp.csv
-TRUPP_PLAYWRIGHT = "trupp_playwright.csv"
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+# fast path for server-rendered player pages (plain HTTP + C parser)
+from selectolax.lexbor import LexborHTMLParser as HTMLParser
+from data_fetch import HEADERS, throttle_async
+from scrape_playwright import (
+    CHROMIUM_ARGS, accept_cookies, browser_context, install_routes, scrape_roster_browser, scrape_roster_http,
+)
+
+# default roster CSV (see --trupp)
 TRUPP_CSV = "trupp.csv"
 
-# simple cookie accept helper (same heuristics as scrape_playwright)
-def _accept_cookies(page):
-    try_selectors = [
-        "button:has-text('Acceptera alla')",
-        "button:has-text('Acceptera')",
-        "#onetrust-accept-btn-handler",
-        "button.cookie-accept",
-    ]
-    for sel in try_selectors:
-        try:
-            el = page.query_selector(sel)
-            if el:
-                el.click()
-                page.wait_for_timeout(250)
-                return True
-        except Exception:
-            pass
-    return False
+# max number of player pages loaded at the same time
+MAX_CONCURRENCY = 5
+
+# on-disk cache of player page HTML (keyed by URL)
+CACHE_DIR = os.path.join(".cache", "players")
+CACHE_TTL = 24 * 60 * 60
+
+
+def _cache_path(href: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha1(href.encode("utf-8")).hexdigest() + ".html")
+
+
+def _cache_get(href: str):
+    """Return cached HTML for href, or None if missing or older than CACHE_TTL."""
+    path = _cache_path(href)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _cache_put(href: str, html: str):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(_cache_path(href), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+# runs before any page script: mark consent as given so the banner usually never renders
+CONSENT_INIT_SCRIPT = """
+try {
+    document.cookie = 'OptanonAlertBoxClosed=' + new Date().toISOString() + '; path=/';
+    localStorage.setItem('cookieConsent', 'true');
+} catch (e) {}
+"""
 
 
-def fetch_player_appearances(href: str, max_wait_ms: int = 2000):
+# in-page lookup of the season table in one round-trip: the table right after the
+# '2025/26' <h4> (else the first table), as outerHTML; null if the page has no table.
+# The markup is parsed by _parse_season_table like cached and static pages, so a player
+# gets the same cell texts whichever path fetched it.
+SEASON_TABLE_JS = """() => {
+    const h4 = [...document.querySelectorAll('h4')].find(h => h.innerText.includes('2025/26')
+        && h.nextElementSibling && h.nextElementSibling.tagName === 'TABLE');
+    const tbl = h4 ? h4.nextElementSibling : document.querySelector('table');
+    return tbl ? tbl.outerHTML : null;
+}"""
+
+
+def _season_rows(headers, body):
+    """Map season table cell texts (one list per body row) to appearance dicts."""
+    col_map = {h.lower(): i for i, h in enumerate(headers)}
+    # resolve column positions once into a plain (out_key, col_idx) list; keys whose
+    # header is missing are filled with "" up front
+    out_keys = (
+        ("competition", "tävling"),
+        ("team", "lag"),
+        ("matches", "ma"),
+        ("goals", "må"),
+        ("assists", "ass"),
+        ("points", "p"),
+        ("penalty", "utv"),
+    )
+    col_plan = [(key, col_map[h]) for key, h in out_keys if h in col_map]
+    empty_row = {key: "" for key, _ in out_keys}
+    n_headers = len(headers)
+    rows = []
+    for tds in body:
+        if not tds or len(tds) < n_headers:
+            continue
+        # Extract all columns, including TOTALT row
+        row_data = empty_row.copy()
+        for key, i in col_plan:
+            row_data[key] = tds[i]
+        rows.append(row_data)
+    return rows
+
+
+async def fetch_player_appearances(context, href: str, max_wait_ms: int = 2000):
     """Return a list of appearance dicts for a player page URL.
 
+    Opens a page in the given (pooled) browser ``context`` and closes it when done.
     Each dict contains at least 'competition' and 'raw_cols'.
     """
     rows = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(href, wait_until="networkidle")
-        _accept_cookies(page)
-        page.wait_for_timeout(500)
-
-        # Find the <h4> with text '2025/26' and get the next <table> sibling
-        season_table = None
-        h4s = page.query_selector_all("h4")
-        for h4 in h4s:
-            if "2025/26" in h4.inner_text():
-                # Try to get the next sibling table
-                table = h4.evaluate_handle("el => el.nextElementSibling")
-                if table and table.evaluate("el => el.tagName.toLowerCase()") == "table":
-                    season_table = table
-                    break
-
-        # Fallback: use first table if not found
-        if not season_table:
-            tables = page.query_selector_all("table")
-            season_table = tables[0] if tables else None
-
-        if season_table:
-            headers = []
-            thead = season_table.query_selector("thead")
-            if thead:
-                headers = [th.inner_text().strip() for th in thead.query_selector_all("th")]
-            col_map = {h.lower(): i for i, h in enumerate(headers)}
-            for tr in season_table.query_selector_all("tbody tr"):
-                tds = tr.query_selector_all("td")
-                if not tds or len(tds) < len(headers):
-                    continue
-                # Extract all columns, including TOTALT row
-                row_data = {
-                    "competition": tds[col_map.get("tävling", 0)].inner_text().strip() if "tävling" in col_map else "",
-                    "team": tds[col_map.get("lag", 1)].inner_text().strip() if "lag" in col_map else "",
-                    "matches": tds[col_map.get("ma", 2)].inner_text().strip() if "ma" in col_map else "",
-                    "goals": tds[col_map.get("må", 3)].inner_text().strip() if "må" in col_map else "",
-                    "assists": tds[col_map.get("ass", 4)].inner_text().strip() if "ass" in col_map else "",
-                    "points": tds[col_map.get("p", 5)].inner_text().strip() if "p" in col_map else "",
-                    "penalty": tds[col_map.get("utv", 6)].inner_text().strip() if "utv" in col_map else ""
-                }
-                rows.append(row_data)
-        browser.close()
+    page = await context.new_page()
+    try:
+        await page.goto(href, wait_until="domcontentloaded")
+        await accept_cookies(page)
+        # wait for the stats table itself rather than a fixed delay
+        try:
+            await page.wait_for_selector("table", timeout=max_wait_ms)
+        except PlaywrightTimeoutError:
+            pass
+
+        # locate the season table in a single evaluate instead of per-h4 calls
+        html = await page.evaluate(SEASON_TABLE_JS)
+        if html:
+            _cache_put(href, html)
+            rows = _parse_season_table(html) or []
+    finally:
+        await page.close()
     return rows
 
 
-def _looks_like_division(text: str) -> bool:
-    if not text:
-        return False
-    text = text.lower()
-    # basic heuristics: contains known Swedish words or common labels
-    tokens = ["herr", "junior", "p09", "p-09", "p10", "flick", "allsvenskan", "division", "serie", "jun", "9-manna", "7-manna"]
-    for t in tokens:
-        if t in text:
-            return True
-    # also accept short codes like 'JAS', 'P09'
-    if re.match(r"^[A-ZÅÄÖ0-9\- ]{1,12}$", text) and any(ch.isdigit() for ch in text):
-        return True
-    return False
+def _cell_text(node) -> str:
+    """Cell text with whitespace runs collapsed to single spaces.
 
+    Text nodes are joined as-is, so '<a>Division 1</a> <span>(P)</span>' gives
+    'Division 1 (P)' and adjacent inline tags aren't split apart, like innerText.
+    """
+    return " ".join(node.text(strip=False).split())
 
-def main():
-    # Always use trupp.csv (latest)
-    if os.path.exists(TRUPP_CSV):
-        trupp = pd.read_csv(TRUPP_CSV)
-    else:
-        print("No roster CSV found. Run main.py first.")
-        return
 
-    print("Columns detected in trupp.csv:", list(trupp.columns))
-    print("Sample data:")
-    print(trupp.head(10).to_string(index=False))
+def _parse_season_table(html: str):
+    """Parse the season table from static player page HTML with selectolax.
 
-    # For each player, fetch their profile and extract appearance stats
-    appearances = []
-    BASE_URL = "https://stats.innebandy.se"
-    for idx, row in trupp.iterrows():
-        name = row.get("namn") or row.get("name")
-        position = row.get("position", "?")
-        href = row.get("href")
-        if not isinstance(href, str) or not href.strip():
-            continue
-        # Ensure href is absolute
-        if href.startswith("/"):
-            href_full = BASE_URL + href
-        elif href.startswith("http"):
-            href_full = href
-        else:
-            href_full = BASE_URL + "/" + href
-        # Prefix position: F, B, M
-        pos_prefix = "F" if "forw" in position.lower() else ("B" if "back" in position.lower() else ("M" if "mål" in position.lower() else "?"))
-        player_label = f"{pos_prefix}-{name}"
+    Returns the same row dicts as fetch_player_appearances, or None if the page
+    has no table (i.e. it is rendered by JS and needs the browser).
+    """
+    tree = HTMLParser(html)
+    # Find the <h4> with text '2025/26' and get the next <table> sibling
+    season_table = None
+    for h4 in tree.css("h4"):
+        if "2025/26" in h4.text():
+            sib = h4.next
+            while sib is not None and sib.tag == "-text":
+                sib = sib.next
+            if sib is not None and sib.tag == "table":
+                season_table = sib
+                break
+
+    # Fallback: use first table if not found
+    if season_table is None:
+        season_table = tree.css_first("table")
+    if season_table is None:
+        return None
+
+    headers = [_cell_text(th) for th in season_table.css("thead th")]
+    body = [[_cell_text(td) for td in tr.css("td")] for tr in season_table.css("tbody tr")]
+    return _season_rows(headers, body)
+
+
+async def _fetch_player_static(client, href: str):
+    """Try the plain HTTP fast path; return None if the browser is needed."""
+    try:
+        await throttle_async(href)
+        r = await client.get(href)
+        r.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    rows = _parse_season_table(r.text)
+    if rows is not None:
+        _cache_put(href, r.text)
+    return rows
+
+
+async def _fetch_player_rows(pool, client, href: str):
+    """Fetch one player's rows from the disk cache, plain HTTP, or the browser.
+
+    Tries the HTTP ``client`` first and only takes a pooled browser
+    context (starting the browser on first use) if the page turns out to be JS-rendered.
+    """
+    cached = _cache_get(href)
+    if cached is not None:
+        rows = _parse_season_table(cached)
+        if rows is not None:
+            return rows
+    rows = await _fetch_player_static(client, href)
+    if rows is not None:
+        return rows
+    context = await pool.get()
+    try:
+        return await fetch_player_appearances(context, href)
+    finally:
+        pool.put(context)
+
+
+async def _fetch_player(pool, client, sem, player_label: str, href: str, checkpoint=None):
+    """Fetch one player's appearances, holding a slot of ``sem``.
+
+    Successful results are appended to the ``checkpoint`` file (JSON lines) if given.
+    Returns None if the fetch failed.
+    """
+    async with sem:
         print(f"Fetching appearances for {player_label} ...")
         try:
-            player_rows = fetch_player_appearances(href_full)
-            for pr in player_rows:
-                comp = pr.get("competition")
-                team = pr.get("team")
-                matches = pr.get("matches")
-                goals = pr.get("goals")
-                assists = pr.get("assists")
-                points = pr.get("points")
-                penalty = pr.get("penalty")
-                # Only count real leagues/divisions (ignore empty, numeric-only)
-                if not comp or comp.strip() == "" or comp.strip().isdigit():
-                    continue
-                appearances.append({
-                    "player": player_label,
-                    "division": comp.strip(),
-                    "team": team,
-                    "matches": matches,
-                    "goals": goals,
-                    "assists": assists,
-                    "points": points,
-                    "penalty": penalty
-                })
-            time.sleep(0.2)
+            rows = await _fetch_player_rows(pool, client, href)
         except Exception as e:
             print(f"Failed to fetch {player_label}: {e}")
+            return None
+        if checkpoint is not None:
+            entry = {"href": href, "player": player_label, "fetched": time.time(), "rows": rows}
+            checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+        return rows
 
-    if not appearances:
-        print("No appearance rows found for any player.")
-        return
 
-    df_app = pd.DataFrame(appearances)
-    df_app.to_csv("appearances.csv", index=False)
-    print("Saved all player appearances to appearances.csv")
+def _load_checkpoint(path: str) -> dict:
+    """Return {href: rows} from a JSON-lines checkpoint.
 
-    # Reload from appearances.csv and clean up
-    df_app = pd.read_csv("appearances.csv")
-    # Convert matches to integer, invalid values become 0
-    def safe_int(x):
-        try:
-            return int(x)
-        except Exception:
-            return 0
-    df_app["matches"] = df_app["matches"].apply(safe_int)
+    Skips a torn last line and entries older than CACHE_TTL, so a checkpoint left
+    behind by a player that keeps failing doesn't pin everyone else's rows forever.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    now = time.time()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "href" not in entry or now - entry.get("fetched", 0) > CACHE_TTL:
+                continue
+            done[entry["href"]] = entry["rows"]
+    return done
+
+
+class _ContextPool:
+    """Browser contexts shared by the player fetches.
+
+    Chromium is only launched by the first get(), so runs served entirely from
+    the disk cache or plain HTTP never start a browser.
+    """
 
-    # Separate TOTALT rows for validation
-    is_total = df_app["division"].str.upper() == "TOTALT"
-    df_total = df_app[is_total]
-    df_app = df_app[~is_total]
-    # Clean up missing/empty divisions and only keep rows with matches > 0
-    df_app = df_app[df_app["division"].notna() & (df_app["division"] != "") & (df_app["matches"] > 0)]
+    def __init__(self, size: int):
+        self.size = size
+        self.lock = asyncio.Lock()
+        self.queue = None
+        self.playwright = None
+        self.browser = None
+
+    async def _start(self):
+        async with self.lock:
+            if self.queue is not None:
+                return
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+            # one context per concurrent slot; pages are opened and closed per player
+            queue = asyncio.Queue()
+            for _ in range(self.size):
+                context = await self.browser.new_context()
+                await context.add_init_script(CONSENT_INIT_SCRIPT)
+                await install_routes(context, keep_first_party=True)
+                queue.put_nowait(context)
+            self.queue = queue
+
+    async def get(self):
+        if self.queue is None:
+            await self._start()
+        return await self.queue.get()
+
+    def put(self, context):
+        self.queue.put_nowait(context)
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+
+
+async def _fetch_all_appearances(players, max_concurrency: int = MAX_CONCURRENCY, checkpoint=None):
+    """Fetch appearances for (player_label, href) pairs concurrently.
+
+    Returns a list of row lists (None for failed players) in the same order as ``players``.
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+    client = httpx.AsyncClient(http2=True, headers=HEADERS, follow_redirects=True)
+    pool = _ContextPool(max_concurrency)
+    try:
+        return await asyncio.gather(*[_fetch_player(pool, client, sem, label, href, checkpoint) for label, href in players])
+    finally:
+        await pool.close()
+        await client.aclose()
 
-    # Pivot: index=player, columns=division, values=matches
-    pivot = df_app.pivot_table(index="player", columns="division", values="matches", aggfunc="sum", fill_value=0)
-    if pivot.empty:
-        print("No division appearance data to plot.")
-        return
 
-    # Show all players, but limit divisions for readability (max 8 divisions)
-    if len(pivot.columns) > 8:
-        keep_divs = list(pivot.sum().sort_values(ascending=False).index[:8])
-        pivot = pivot[keep_divs]
+# known Swedish words or common labels in division names, as one alternation
+_DIV_TOKENS = re.compile(r"herr|junior|p09|p-09|p10|flick|allsvenskan|division|serie|jun|9-manna|7-manna")
+# short codes like 'JAS', 'P09'
+_SHORT_CODE = re.compile(r"^[A-ZÅÄÖ0-9\- ]{1,12}$")
 
-    ax = pivot.plot(kind="bar", stacked=True, figsize=(max(12, len(pivot)), 7), colormap="tab20")
-    ax.set_title("Player appearances by division/series (stacked)")
-    ax.set_ylabel("Matches played")
-    plt.xticks(rotation=45, ha="right")
-    yticks = list(range(0, max(25, int(pivot.values.max())+5), 5))
-    ax.set_yticks(yticks)
-    ax.grid(axis='y', which='major', linestyle='-', linewidth=0.5, color='gray', zorder=0)
-    ax.set_ylim(0, yticks[-1])
-    plt.tight_layout()
-    # Add legend below chart for division names
-    ax.legend(title="Division/Series", bbox_to_anchor=(0.5, -0.18), loc="upper center", ncol=2)
-    out = "players_division_stack.png"
-    plt.savefig(out, bbox_inches="tight")
-    print(f"Saved stacked chart to {out}")
 
-    # Validation: print any mismatches between sum of matches and TOTALT
-    for player in pivot.index:
-        total_row = df_total[df_total["player"] == player]
-        if not total_row.empty:
-            total_matches = total_row.iloc[0]["matches"]
-            sum_matches = pivot.loc[player].sum()
-            if total_matches != sum_matches:
-                print(f"WARNING: {player} sum of matches ({sum_matches}) does not match TOTALT ({total_matches})")
+def _looks_like_division(text: str) -> bool:
+    if not text:
+        return False
+    # basic heuristics: contains known Swedish words or common labels
+    if _DIV_TOKENS.search(text.lower()):
+        return True
+    # also accept short codes like 'JAS', 'P09'
+    return bool(_SHORT_CODE.match(text)) and any(ch.isdigit() for ch in text)
 
-    # --- New plot: players-per-league stacked chart ---
-    # Create a binary matrix: for each division (league) and player, 1 if player played >=1 match
-    bin_df = df_app.copy()
-    bin_df['played_flag'] = bin_df['matches'].apply(lambda x: 1 if int(x) > 0 else 0)
-    # Pivot: index = division, columns = player, value = played_flag (use max to collapse duplicates)
-    players_per_league = bin_df.pivot_table(index='division', columns='player', values='played_flag', aggfunc='max', fill_value=0)
-    if players_per_league.empty:
-        print("No data for players-per-league plot.")
-        return
 
-    # Optionally limit leagues for readability (keep top 12 by number of players)
-    league_counts = players_per_league.sum(axis=1).sort_values(ascending=False)
-    keep_leagues = list(league_counts.index[:12])
-    players_per_league = players_per_league.loc[keep_leagues]
+def _plot_stacked(ax, frame: pd.DataFrame):
+    """Draw one stacked bar per row of frame, one rasterized segment per column (tab20 colors)."""
+    x = np.arange(len(frame))
+    bottoms = np.zeros(len(frame))
+    colors = matplotlib.colormaps["tab20"](np.linspace(0, 1, len(frame.columns)))
+    for col, color in zip(frame.columns, colors):
+        values = frame[col].to_numpy(dtype=float)
+        ax.bar(x, values, width=0.5, bottom=bottoms, label=str(col), color=color, rasterized=True)
+        bottoms += values
+    ax.set_xticks(x)
+    ax.set_xticklabels([str(i) for i in frame.index], rotation=45, ha="right")
+    ax.set_xlabel(frame.index.name or "")
 
-    # Plot stacked bars: each column is a player, stacked per league
-    ax2 = players_per_league.plot(kind='bar', stacked=True, figsize=(12, max(6, len(players_per_league)/2)), colormap='tab20')
-    ax2.set_title('Number of distinct players per league (each player counts 1)')
-    ax2.set_ylabel('Number of players')
-    # Keep division names visible, but remove the long player legend below to reduce clutter
-    # (division names are on the x-axis index)
-    # y-grid at 1,2,3... up to max
-    max_players = int(players_per_league.sum(axis=1).max())
-    ax2.set_yticks(range(0, max(5, max_players+1)))
-    ax2.grid(axis='y', which='major', linestyle='-', linewidth=0.5, color='gray', zorder=0)
-    plt.tight_layout()
-    # Remove the player legend to avoid a huge list of names under the chart
-    leg = ax2.get_legend()
-    if leg:
-        leg.remove()
-    out2 = 'players_per_league_stack.png'
-    plt.savefig(out2, bbox_inches='tight')
-    print(f"Saved players-per-league stacked chart to {out2}")
 
+def _player_names(trupp: pd.DataFrame) -> pd.Series:
+    """Player names from the 'namn' column, falling back to 'name'."""
+    names = trupp["namn"] if "namn" in trupp.columns else pd.Series(index=trupp.index, dtype=object)
+    if "name" in trupp.columns:
+        names = names.fillna(trupp["name"])
+    return names.fillna("").astype(str)
 
-def analyze_trupp(trupp: pd.DataFrame, out_prefix: str = "", max_divisions: int = 8, max_leagues: int = 12):
+
+def analyze_trupp(trupp: pd.DataFrame, out_prefix: str = "", max_divisions: int = 8, max_leagues: int = 12, export_csv: bool = False):
     """Run the full analysis on a trupp DataFrame and save outputs with optional prefix.
 
     Returns the appearances DataFrame (cleaned).
@@ -282,68 +373,80 @@ def analyze_trupp(trupp: pd.DataFrame, out_prefix: str = "", max_divisions: int
     # For each player, fetch their profile and extract appearance stats
     appearances = []
     BASE_URL = "https://stats.innebandy.se"
-    for idx, row in trupp.iterrows():
-        name = row.get("namn") or row.get("name")
-        position = row.get("position", "?")
-        href = row.get("href")
-        if not isinstance(href, str) or not href.strip():
-            continue
-        # Ensure href is absolute
-        if href.startswith("/"):
-            href_full = BASE_URL + href
-        elif href.startswith("http"):
-            href_full = href
-        else:
-            href_full = BASE_URL + "/" + href
-        # Prefix position: F, B, M
-        pos_prefix = "F" if "forw" in position.lower() else ("B" if "back" in position.lower() else ("M" if "mål" in position.lower() else "?"))
-        player_label = f"{pos_prefix}-{name}"
-        print(f"Fetching appearances for {player_label} ...")
-        try:
-            player_rows = fetch_player_appearances(href_full)
-            for pr in player_rows:
-                comp = pr.get("competition")
-                team = pr.get("team")
-                matches = pr.get("matches")
-                goals = pr.get("goals")
-                assists = pr.get("assists")
-                points = pr.get("points")
-                penalty = pr.get("penalty")
-                # Only count real leagues/divisions (ignore empty, numeric-only)
-                if not comp or comp.strip() == "" or comp.strip().isdigit():
-                    continue
-                appearances.append({
-                    "player": player_label,
-                    "division": comp.strip(),
-                    "team": team,
-                    "matches": matches,
-                    "goals": goals,
-                    "assists": assists,
-                    "points": points,
-                    "penalty": penalty
-                })
-            time.sleep(0.2)
-        except Exception as e:
-            print(f"Failed to fetch {player_label}: {e}")
+    # Normalize labels and links column-wise, then walk the prepared frame
+    hrefs = trupp["href"].fillna("").astype(str) if "href" in trupp.columns else pd.Series("", index=trupp.index)
+    # Ensure href is absolute
+    href_full = np.where(
+        hrefs.str.startswith("http"), hrefs,
+        np.where(hrefs.str.startswith("/"), BASE_URL + hrefs, BASE_URL + "/" + hrefs),
+    )
+    # Prefix position: F, B, M
+    position = trupp["position"].fillna("?").astype(str).str.lower() if "position" in trupp.columns else pd.Series("?", index=trupp.index)
+    pos_prefix = np.select(
+        [position.str.contains("forw"), position.str.contains("back"), position.str.contains("mål")],
+        ["F", "B", "M"], default="?",
+    )
+    roster = pd.DataFrame({
+        "label": pd.Series(pos_prefix, index=trupp.index) + "-" + _player_names(trupp),
+        "href_full": href_full,
+    }, index=trupp.index)[hrefs.str.strip() != ""]
+    players = [(r.label, r.href_full) for r in roster.itertuples(index=False)]
+
+    # Players already in the checkpoint (from an interrupted run) are not fetched again
+    checkpoint_path = f"{out_prefix}appearances.jsonl"
+    results = _load_checkpoint(checkpoint_path)
+    todo = [(label, href) for label, href in players if href not in results]
+    if results:
+        print(f"Resuming: {len(players) - len(todo)} players already fetched in {checkpoint_path}")
+    fetched = []
+    if todo:
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            fetched = asyncio.run(_fetch_all_appearances(todo, checkpoint=checkpoint))
+        results.update((href, rows) for (_, href), rows in zip(todo, fetched) if rows is not None)
+    # Complete run: the checkpoint is only needed to resume after a crash or failed players
+    if all(rows is not None for rows in fetched) and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    for player_label, href in players:
+        for pr in results.get(href, []):
+            comp = pr.get("competition")
+            team = pr.get("team")
+            matches = pr.get("matches")
+            goals = pr.get("goals")
+            assists = pr.get("assists")
+            points = pr.get("points")
+            penalty = pr.get("penalty")
+            # Only count real leagues/divisions (ignore empty, numeric-only)
+            if not comp or comp.strip() == "" or comp.strip().isdigit():
+                continue
+            appearances.append({
+                "player": player_label,
+                "division": comp.strip(),
+                "team": team,
+                "matches": matches,
+                "goals": goals,
+                "assists": assists,
+                "points": points,
+                "penalty": penalty
+            })
 
     if not appearances:
         print("No appearance rows found for any player.")
         return pd.DataFrame()
 
     df_app = pd.DataFrame(appearances)
-    app_csv = f"{out_prefix}appearances.csv" if out_prefix else "appearances.csv"
-    df_app.to_csv(app_csv, index=False)
-    print(f"Saved all player appearances to {app_csv}")
-
-    # Reload from appearances.csv and clean up
-    df_app = pd.read_csv(app_csv)
     # Convert matches to integer, invalid values become 0
-    def safe_int(x):
-        try:
-            return int(x)
-        except Exception:
-            return 0
-    df_app["matches"] = df_app["matches"].apply(safe_int)
+    df_app["matches"] = pd.to_numeric(df_app["matches"], errors="coerce").fillna(0).astype("int32")
+    # Few distinct players/divisions: categorical keys let every groupby below hash small
+    # integer codes instead of strings (always with observed=True to skip unused categories)
+    df_app = df_app.astype({"player": "category", "division": "category"})
+    app_parquet = f"{out_prefix}appearances.parquet"
+    df_app.to_parquet(app_parquet, engine="pyarrow", compression="zstd", index=False)
+    print(f"Saved all player appearances to {app_parquet}")
+    if export_csv:
+        app_csv = f"{out_prefix}appearances.csv"
+        df_app.to_csv(app_csv, index=False)
+        print(f"Saved all player appearances to {app_csv}")
 
     # Separate TOTALT rows for validation
     is_total = df_app["division"].str.upper() == "TOTALT"
@@ -353,45 +456,45 @@ def analyze_trupp(trupp: pd.DataFrame, out_prefix: str = "", max_divisions: int
     df_app = df_app[df_app["division"].notna() & (df_app["division"] != "") & (df_app["matches"] > 0)]
 
     # Pivot: index=player, columns=division, values=matches
-    pivot = df_app.pivot_table(index="player", columns="division", values="matches", aggfunc="sum", fill_value=0)
+    pivot = df_app.groupby(["player", "division"], observed=True, sort=False)["matches"].sum().unstack(fill_value=0)
     if pivot.empty:
         print("No division appearance data to plot.")
         return df_app
 
     # Show all divisions; make the figure wider if there are many divisions so labels remain readable
-    pivot_plot = pivot.copy()
     # dynamic width: ~0.6 inch per division, min 12 inches
-    width = max(12, int(len(pivot_plot.columns) * 0.6))
-    ax = pivot_plot.plot(kind="bar", stacked=True, figsize=(width, 7), colormap="tab20")
+    width = max(12, int(len(pivot.columns) * 0.6))
+    # one headless Agg figure, cleared and reused for the second chart
+    fig = Figure(figsize=(width, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    _plot_stacked(ax, pivot)
     ax.set_title("Player appearances by division/series (stacked)")
     ax.set_ylabel("Matches played")
-    plt.xticks(rotation=45, ha="right")
-    yticks = list(range(0, max(25, int(pivot_plot.values.max())+5), 5))
+    yticks = list(range(0, max(25, int(pivot.values.max())+5), 5))
     ax.set_yticks(yticks)
     ax.grid(axis='y', which='major', linestyle='-', linewidth=0.5, color='gray', zorder=0)
     ax.set_ylim(0, yticks[-1])
-    plt.tight_layout()
+    fig.tight_layout()
     # Add legend below chart for division names
     ax.legend(title="Division/Series", bbox_to_anchor=(0.5, -0.18), loc="upper center", ncol=2)
     out = f"{out_prefix}players_division_stack.png" if out_prefix else "players_division_stack.png"
-    plt.savefig(out, bbox_inches="tight")
+    fig.savefig(out, bbox_inches="tight")
     print(f"Saved stacked chart to {out}")
 
     # Validation: print any mismatches between sum of matches and TOTALT
-    for player in pivot.index:
-        total_row = df_total[df_total["player"] == player]
-        if not total_row.empty:
-            total_matches = total_row.iloc[0]["matches"]
-            sum_matches = pivot.loc[player].sum()
-            if total_matches != sum_matches:
-                print(f"WARNING: {player} sum of matches ({sum_matches}) does not match TOTALT ({total_matches})")
+    totals = df_total.drop_duplicates("player").set_index("player")["matches"]
+    totals = totals.reindex(pivot.index.astype(object)).dropna().astype(int)
+    sums = pivot.sum(axis=1).set_axis(pivot.index.astype(object)).reindex(totals.index)
+    for player, total_matches in totals[totals != sums].items():
+        print(f"WARNING: {player} sum of matches ({sums[player]}) does not match TOTALT ({total_matches})")
 
     # --- New plot: players-per-league stacked chart ---
     # Create a binary matrix: for each division (league) and player, 1 if player played >=1 match
     bin_df = df_app.copy()
-    bin_df['played_flag'] = bin_df['matches'].apply(lambda x: 1 if int(x) > 0 else 0)
+    bin_df['played_flag'] = (bin_df['matches'].to_numpy() > 0).astype('int8')
     # Pivot: index = division, columns = player, value = played_flag (use max to collapse duplicates)
-    players_per_league = bin_df.pivot_table(index='division', columns='player', values='played_flag', aggfunc='max', fill_value=0)
+    players_per_league = bin_df.groupby(['division', 'player'], observed=True, sort=False)['played_flag'].max().unstack(fill_value=0)
     if players_per_league.empty:
         print("No data for players-per-league plot.")
         return df_app
@@ -399,26 +502,34 @@ def analyze_trupp(trupp: pd.DataFrame, out_prefix: str = "", max_divisions: int
     # Keep all leagues and make figure wider if needed so division names stay readable
     width2 = max(12, int(len(players_per_league.index) * 0.6))
     # Plot stacked bars: each column is a player, stacked per league
-    ax2 = players_per_league.plot(kind='bar', stacked=True, figsize=(width2, max(6, len(players_per_league)/2)), colormap='tab20')
+    fig.clear()
+    fig.set_size_inches(width2, max(6, len(players_per_league)/2))
+    ax2 = fig.subplots()
+    # Division names are tilted on the x-axis; no player legend to reduce clutter
+    _plot_stacked(ax2, players_per_league)
     ax2.set_title('Number of distinct players per league (each player counts 1)')
     ax2.set_ylabel('Number of players')
-    # Tilt division names for readability and remove the long player legend below to reduce clutter
-    plt.xticks(rotation=45, ha='right')
-    leg = ax2.get_legend()
-    if leg:
-        leg.remove()
     # y-grid at 1,2,3... up to max
     max_players = int(players_per_league.sum(axis=1).max())
     ax2.set_yticks(range(0, max(5, max_players+1)))
     ax2.grid(axis='y', which='major', linestyle='-', linewidth=0.5, color='gray', zorder=0)
-    plt.tight_layout()
+    fig.tight_layout()
     out2 = f'{out_prefix}players_per_league_stack.png' if out_prefix else 'players_per_league_stack.png'
-    plt.savefig(out2, bbox_inches='tight')
+    fig.savefig(out2, bbox_inches='tight')
     print(f"Saved players-per-league stacked chart to {out2}")
 
     return df_app
 
 
+async def _scrape_team_roster(url: str) -> pd.DataFrame:
+    # only launch Chromium when the server-rendered table can't be parsed
+    trupp = await scrape_roster_http(url)
+    if not trupp.empty:
+        return trupp
+    async with browser_context() as context:
+        return await scrape_roster_browser(context, url)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze players appearances (single team or from URL)')
     parser.add_argument('--trupp', type=str, default=TRUPP_CSV, help='Path to trupp CSV')
@@ -427,14 +538,12 @@ def main():
     parser.add_argument('--player', type=str, help='If set, only analyze players whose name contains this substring (case-insensitive)')
     parser.add_argument('--max-divisions', type=int, default=8, help='Max divisions to display on per-player chart; others aggregated into Other (0 = keep all)')
     parser.add_argument('--max-leagues', type=int, default=12, help='Max leagues to display on players-per-league chart; others aggregated into Other (0 = keep all)')
+    parser.add_argument('--export-csv', action='store_true', help='Also write appearances as CSV next to the parquet file')
     args = parser.parse_args()
 
     if args.team_url:
-        if scrape_roster is None:
-            print('scrape_playwright.py not available; cannot scrape team URL')
-            return
         print(f'Scraping roster from {args.team_url} ...')
-        trupp = scrape_roster(args.team_url)
+        trupp = asyncio.run(_scrape_team_roster(args.team_url))
         if trupp.empty:
             print('Failed to scrape roster from URL')
             return
@@ -446,13 +555,13 @@ def main():
 
     # optional player filter
     if args.player:
-        mask = trupp.apply(lambda r: args.player.lower() in (str(r.get('namn') or r.get('name') or '')).lower(), axis=1)
+        mask = _player_names(trupp).str.lower().str.contains(args.player.lower(), regex=False)
         trupp = trupp[mask]
         if trupp.empty:
             print(f'No players matching "{args.player}" found in roster')
             return
 
-    analyze_trupp(trupp, out_prefix=args.out_prefix, max_divisions=args.max_divisions, max_leagues=args.max_leagues)
+    analyze_trupp(trupp, out_prefix=args.out_prefix, max_divisions=args.max_divisions, max_leagues=args.max_leagues, export_csv=args.export_csv)
 
 
 if __name__ == "__main__":
@@ -4,13 +4,18 @@ This file contains resilient scraping helpers for the team's roster (/trupp)
 and schedule (/spelprogram). You'll likely need to adapt selectors after
 inspecting the real page HTML.
 """
+import io
 import re
+import asyncio
 import time
+import threading
 from typing import List, Dict
+from urllib.parse import urlsplit
 
-import requests
+import httpx
+import lxml.html
+from lxml.etree import ParserError
 import pandas as pd
-from bs4 import BeautifulSoup
 
 # polite headers
 HEADERS = {
@@ -19,16 +24,79 @@ HEADERS = {
 
 DEFAULT_TIMEOUT = 12
 
+# polite rate limit per host: sustained requests/second and allowed burst
+RATE_PER_SEC = 5.0
+RATE_BURST = 5
 
-def fetch_soup(url: str, timeout: int = DEFAULT_TIMEOUT) -> BeautifulSoup:
-    """Fetch URL and return BeautifulSoup object (lxml parser).
-    Raises requests.HTTPError on bad status.
+# one shared client: keeps a single HTTP/2 connection open and multiplexes requests over it
+CLIENT = httpx.Client(
+    http2=True,
+    headers=HEADERS,
+    follow_redirects=True,
+    limits=httpx.Limits(max_keepalive_connections=1, max_connections=4),
+)
+
+
+class _TokenBucket:
+    """Thread-safe token bucket; acquire() blocks only when the burst is used up."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it (0 if none)."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            self.tokens -= 1
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+
+_buckets: Dict[str, _TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket(url: str) -> _TokenBucket:
+    """Return the token bucket of the URL's host (shared by sync and async callers)."""
+    host = urlsplit(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = _TokenBucket(RATE_PER_SEC, RATE_BURST)
+    return bucket
+
+
+def _throttle(url: str):
+    """Wait for a token from the bucket of the URL's host."""
+    _bucket(url).acquire()
+
+
+async def throttle_async(url: str):
+    """Like _throttle, but awaits instead of blocking the event loop."""
+    wait = _bucket(url).reserve()
+    if wait:
+        await asyncio.sleep(wait)
+
+
+def fetch_html(url: str, timeout: int = DEFAULT_TIMEOUT) -> str:
+    """Fetch URL and return the response body as text.
+    Raises httpx.HTTPStatusError on bad status.
     """
-    r = requests.get(url, headers=HEADERS, timeout=timeout)
+    _throttle(url)
+    r = CLIENT.get(url, timeout=timeout)
     r.raise_for_status()
-    # small polite delay (caller can increase)
-    time.sleep(0.2)
-    return BeautifulSoup(r.text, "lxml")
+    return r.text
 
 
 def _extract_id_from_href(href: str) -> str:
@@ -53,56 +121,85 @@ def scrape_trupp(url: str) -> pd.DataFrame:
     return pd.DataFrame([])
 
 
+def read_first_table(html: str):
+    """Read the first <table> of html with pd.read_html, each body cell as a (text, href) tuple.
+
+    colspan/rowspan are removed from body cells first, so a spanning cell stays one
+    cell instead of being copied into every column; the missing cells of short rows
+    come back as "" rather than tuples. Returns None if there is no table.
+    """
+    try:
+        doc = lxml.html.fromstring(html)
+    except ParserError:
+        return None
+    tables = doc.xpath("//table")
+    if not tables:
+        return None
+    table = tables[0]
+    for cell in table.xpath(".//td | .//tbody//th"):
+        cell.attrib.pop("colspan", None)
+        cell.attrib.pop("rowspan", None)
+    try:
+        return pd.read_html(
+            io.StringIO(lxml.html.tostring(table, encoding="unicode")),
+            flavor="lxml", extract_links="body", keep_default_na=False,
+        )[0]
+    except ValueError:
+        return None
+
+
 def scrape_spelprogram(url: str) -> pd.DataFrame:
     """Scrape the team's schedule (/spelprogram) and return DataFrame with
     columns: match_id (if present), date, opponent, competition, link
 
     Again, the site structure may require small selector changes.
     """
-    soup = fetch_soup(url)
+    html = fetch_html(url)
     rows: List[Dict] = []
 
-    # look for a table of matches
-    table = soup.find("table")
-    if table:
-        for tr in table.find_all("tr"):
-            tds = tr.find_all(["td", "th"])
-            if not tds:
+    # look for a table of matches; pandas parses the cells in one pass and keeps each
+    # body cell's href next to its text, so links can't drift onto another row
+    table = read_first_table(html)
+    if table is not None:
+        for row in table.itertuples(index=False):
+            # real cells only: short and spanning rows (month headers) keep their own width
+            cells = [c for c in row if isinstance(c, tuple)]
+            if not cells:
                 continue
-            texts = [td.get_text(strip=True) for td in tds]
+            texts = [text for text, _ in cells]
+            opponent = None
+            link = None
+            # match link text, else the first link in the row (sometimes opponent is link too)
+            for text, href in cells:
+                if not href:
+                    continue
+                if "/match/" in href:
+                    link = href
+                    opponent = text
+                else:
+                    opponent = opponent or text
             # Heuristic mapping — adapt if columns differ
             # Common patterns: date | time | opponent | competition | result
             date = None
-            opponent = None
             competition = None
-            link = None
-            for td in tds:
-                a = td.find("a")
-                if a and a.has_attr("href"):
-                    href = a["href"]
-                    # match link
-                    if "/match/" in href or "/match/" in href:
-                        link = href
-                        opponent = a.get_text(strip=True)
-                    else:
-                        # sometimes opponent is link too
-                        opponent = opponent or a.get_text(strip=True)
-            # fallback to textual heuristics
             if len(texts) >= 3:
                 date = texts[0]
                 opponent = opponent or texts[2]
                 competition = texts[3] if len(texts) > 3 else None
-            # extract match id if present
             match_id = _extract_id_from_href(link) if link else None
             rows.append({"match_id": match_id, "date": date, "opponent": opponent, "competition": competition, "link": link, "raw_cols": texts})
 
     # fallback: look for list items or anchors with "match" keywords
     if not rows:
-        for a in soup.find_all("a", href=True):
-            txt = a.get_text(strip=True)
+        try:
+            doc = lxml.html.fromstring(html)
+        except ParserError:
+            return pd.DataFrame(rows)
+        for a in doc.xpath("//a[@href]"):
+            txt = a.text_content().strip()
             if "match" in txt.lower() or re.search(r"\d{4}-\d{2}-\d{2}", txt):
-                match_id = _extract_id_from_href(a["href"])
-                rows.append({"match_id": match_id, "date": txt, "opponent": None, "competition": None, "link": a["href"], "raw_cols": [txt]})
+                match_id = _extract_id_from_href(a.get("href"))
+                rows.append({"match_id": match_id, "date": txt, "opponent": None, "competition": None, "link": a.get("href"), "raw_cols": [txt]})
 
     return pd.DataFrame(rows)
 
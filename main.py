@@ -1,10 +1,11 @@
 import os
+import asyncio
 import pandas as pd
 from processing import clean_trupp, save_csv
 
 # try to use Playwright-based scraper if available (handles JS + cookies)
 try:
-    from scrape_playwright import scrape_roster, scrape_generic_links
+    from scrape_playwright import browser_context, scrape_roster, scrape_generic_links
     HAVE_PLAYWRIGHT = True
 except Exception:
     HAVE_PLAYWRIGHT = False
@@ -15,51 +16,69 @@ TEAM_TRUPP = "https://stats.innebandy.se/sasong/43/lag/24067/trupp"
 TEAM_SPELPROGRAM = "https://stats.innebandy.se/sasong/43/lag/24067/spelprogram"
 
 
+async def _playwright_roster(context):
+    # Only use Playwright scraper for roster (requests fallback removed)
+    trupp = None
+    try:
+        print("Using Playwright scraper for roster...")
+        trupp = await scrape_roster(context, TEAM_TRUPP)
+        if trupp is not None and not trupp.empty:
+            trupp = clean_trupp(trupp)
+            save_csv(trupp, "trupp.csv")
+            print(f"Saved trupp.csv ({len(trupp)} rows) from Playwright")
+            try:
+                print("--- trupp (sample) ---")
+                print(trupp.head(20).to_string(index=False))
+            except Exception:
+                print(trupp.head(20))
+        else:
+            print("Playwright scraper returned no players.")
+    except Exception as e:
+        print("Playwright roster scraper failed:", e)
+    return trupp
+
+
+async def _playwright_schedule(context):
+    # --- schedule / spelprogram ---
+    sched = None
+    try:
+        print("Using Playwright scraper for schedule links...")
+        sched = await scrape_generic_links(context, TEAM_SPELPROGRAM, 'match')
+        if sched is not None and not sched.empty:
+            save_csv(sched, "spelprogram.csv")
+            print(f"Saved spelprogram.csv ({len(sched)} rows) from Playwright")
+            # print a preview of schedule links
+            try:
+                print("--- spelprogram (sample) ---")
+                print(sched.head(20).to_string(index=False))
+            except Exception:
+                print(sched.head(20))
+        else:
+            print("Playwright schedule scraper returned no match anchors. See spelprogram_playwright.csv for other links.")
+    except Exception as e:
+        print("Playwright schedule scraper failed:", e)
+    return sched
+
+
+async def _playwright_scrapes():
+    # one browser for both roster and schedule; the two pages load concurrently
+    async with browser_context() as context:
+        return await asyncio.gather(_playwright_roster(context), _playwright_schedule(context))
+
+
 def main():
     print("Starting fetch...")
 
     trupp = None
-    # Only use Playwright scraper for roster (requests fallback removed)
+    sched = None
     if HAVE_PLAYWRIGHT:
         try:
-            print("Using Playwright scraper for roster...")
-            trupp = scrape_roster(TEAM_TRUPP)
-            if trupp is not None and not trupp.empty:
-                trupp = clean_trupp(trupp)
-                save_csv(trupp, "trupp.csv")
-                print(f"Saved trupp.csv ({len(trupp)} rows) from Playwright")
-                try:
-                    print("--- trupp (sample) ---")
-                    print(trupp.head(20).to_string(index=False))
-                except Exception:
-                    print(trupp.head(20))
-            else:
-                print("Playwright scraper returned no players.")
+            trupp, sched = asyncio.run(_playwright_scrapes())
         except Exception as e:
-            print("Playwright roster scraper failed:", e)
+            print("Playwright browser failed:", e)
     else:
         print("Playwright is required for roster scraping. Please install Playwright and browsers.")
 
-    # --- schedule / spelprogram ---
-    sched = None
-    if HAVE_PLAYWRIGHT:
-        try:
-            print("Using Playwright scraper for schedule links...")
-            sched = scrape_generic_links(TEAM_SPELPROGRAM, 'match')
-            if sched is not None and not sched.empty:
-                save_csv(sched, "spelprogram.csv")
-                print(f"Saved spelprogram.csv ({len(sched)} rows) from Playwright")
-                # print a preview of schedule links
-                try:
-                    print("--- spelprogram (sample) ---")
-                    print(sched.head(20).to_string(index=False))
-                except Exception:
-                    print(sched.head(20))
-            else:
-                print("Playwright schedule scraper returned no match anchors. See spelprogram_playwright.csv for other links.")
-        except Exception as e:
-            print("Playwright schedule scraper failed:", e)
-
     if sched is None or sched.empty:
         try:
             print("Falling back to requests-based scraper for schedule...")
@@ -3,7 +3,7 @@
 This uses a real browser so JS-rendered content and cookie dialogs work.
 
 Usage (after installing Playwright):
-    python scrape_playwright.py
+    python scrape_playwright.py [--gzip]
 
 Install Playwright (once) in your venv:
     python -m pip install playwright
@@ -12,132 +12,314 @@ Install Playwright (once) in your venv:
 Notes:
 - The script attempts to click a cookie "accept" button if present ("Acceptera alla" or common ids).
 - It extracts anchors whose href contains '/spelare/' to find player names and ids.
-- Save to CSV in the current folder.
+- The roster is first fetched over plain HTTP; the browser is only used when the table
+  is not in the server-rendered HTML.
+- Save to CSV in the current folder (gzip-compressed with --gzip).
 """
-from playwright.sync_api import sync_playwright
+import re
+import asyncio
+import argparse
+import weakref
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import pandas as pd
-import time
+
+from data_fetch import fetch_html, read_first_table
 
 TEAM_TRUPP = "https://stats.innebandy.se/sasong/43/lag/24067/trupp"
 TEAM_SPELPROGRAM = "https://stats.innebandy.se/sasong/43/lag/24067/spelprogram"
 
+# icon ligature text that leaks into sortable header cells
+_HDR_RE = re.compile(r"expand_less|unfold_more")
+
+# browser profile reused across runs (cookies and the consent choice); the HTTP cache
+# is not used because routing (see install_routes) disables it
+PROFILE_DIR = ".pw-profile"
+
+# headless Chromium flags: skip GPU, extensions and background services we never use
+CHROMIUM_ARGS = [
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+    "--disable-features=Translate,BackForwardCache,MediaRouter",
+]
+
+# how long to wait for the element we scrape to appear after DOM ready
+WAIT_TIMEOUT_MS = 10_000
+
+# requests the scrapers never need: heavy resource types and third-party trackers
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_DOMAINS = ("google-analytics", "googletagmanager", "doubleclick", "hotjar", "facebook.net")
+
+
+async def _block_route(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(d in request.url for d in BLOCKED_DOMAINS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# first-party resources (matched in the URL) are let through by _block_third_party_route
+FIRST_PARTY = "innebandy"
+THIRD_PARTY_BLOCKED_TYPES = BLOCKED_RESOURCE_TYPES | {"other"}
+
+
+async def _block_third_party_route(route):
+    request = route.request
+    if FIRST_PARTY in request.url:
+        await route.continue_()
+    elif request.resource_type in THIRD_PARTY_BLOCKED_TYPES or any(d in request.url for d in BLOCKED_DOMAINS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def install_routes(target, keep_first_party: bool = False):
+    """Abort unneeded requests on a page or a whole context.
+
+    With ``keep_first_party`` the site's own stylesheets, images and fonts still load,
+    so the page renders as it does for a visitor; only third-party resources are blocked.
+    """
+    await target.route("**/*", _block_third_party_route if keep_first_party else _block_route)
 
-def accept_cookies(page):
-    # Try a few common accept selectors / texts; ignore failures
-    try_selectors = [
-        "button:has-text('Acceptera alla')",
-        "button:has-text('Acceptera')",
-        "#onetrust-accept-btn-handler",
-        "button.cookie-accept",
-    ]
-    for sel in try_selectors:
+
+# Try a few common accept buttons / texts in one round-trip, click the first
+# match and mark it so we can wait for it to go away. Returns the mark selector or null.
+ACCEPT_COOKIES_JS = """() => {
+    const buttons = [...document.querySelectorAll('button')];
+    const el = buttons.find(b => b.innerText.includes('Acceptera alla'))
+        || buttons.find(b => b.innerText.includes('Acceptera'))
+        || document.querySelector('#onetrust-accept-btn-handler')
+        || document.querySelector('button.cookie-accept');
+    if (!el) return null;
+    el.setAttribute('data-consent-clicked', '');
+    el.click();
+    return '[data-consent-clicked]';
+}"""
+
+# contexts that already accepted cookies in this run; consent is a cookie, so it holds
+# for every page of that context (and the persistent profile keeps it across runs)
+_CONSENTED = weakref.WeakSet()
+
+
+async def accept_cookies(page):
+    if page.context in _CONSENTED:
+        return True
+    try:
+        clicked = await page.evaluate(ACCEPT_COOKIES_JS)
+    except Exception:
+        return False
+    if not clicked:
+        return False
+    _CONSENTED.add(page.context)
+    # wait for the dialog to disappear rather than sleeping a fixed time
+    try:
+        await page.wait_for_selector(clicked, state="hidden", timeout=1000)
+    except PlaywrightTimeoutError:
+        pass
+    return True
+
+
+@asynccontextmanager
+async def browser_context():
+    """Launch Chromium once and yield its persistent BrowserContext to share between scrapes.
+
+    The profile in PROFILE_DIR keeps cookies and the cookie consent between runs.
+    It does not give a warm HTTP cache: Playwright disables the cache once routing
+    is enabled, and the context routes every request to block heavy resources.
+    """
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(
+            user_data_dir=PROFILE_DIR, headless=True, args=CHROMIUM_ARGS
+        )
         try:
-            el = page.query_selector(sel)
-            if el:
-                el.click()
-                # small wait for dialog to disappear
-                time.sleep(0.3)
-                return True
-        except Exception:
+            await install_routes(context)
+            yield context
+        finally:
+            await context.close()
+
+
+@asynccontextmanager
+async def get_page(context):
+    """Open a disposable page on a shared context and close it afterwards.
+    Routes are installed on the context, so pages need no setup of their own.
+    """
+    page = await context.new_page()
+    try:
+        yield page
+    finally:
+        await page.close()
+
+
+def clean_header(h: str) -> str:
+    return _HDR_RE.sub("", h.lower()).strip()
+
+
+def _roster_from_html(html: str, min_rows: int = 1) -> pd.DataFrame:
+    """Parse the first table of a roster page into a DataFrame with player_id, name,
+    position and href. Returns an empty DataFrame if there is no usable table.
+    """
+    # each body cell is a (text, href) tuple; empty cells stay "" like the page shows them
+    table = read_first_table(html)
+    if table is None:
+        return pd.DataFrame()
+    # skip section rows (e.g. a single spanning 'Ledare' cell): players have 2+ real cells
+    real_cells = table.apply(lambda row: sum(isinstance(c, tuple) for c in row), axis=1)
+    table = table[real_cells >= 2] if len(table) else table
+    if len(table) < min_rows:
+        return pd.DataFrame()
+    # Clean up header names (remove sort-icon suffixes); last duplicate wins
+    table.columns = [clean_header(str(c)) for c in table.columns]
+    table = table.loc[:, ~table.columns.duplicated(keep="last")]
+    df = table.map(lambda c: c[0] if isinstance(c, tuple) else str(c))
+    cols = list(df.columns)
+    df["player_id"] = df[cols[cols.index("nr") if "nr" in cols else 0]]
+    df["name"] = df[cols[cols.index("namn") if "namn" in cols else 1]]
+    if "position" not in df.columns:
+        df["position"] = None
+    # Player link for href, from the name cell of the same row
+    if "namn" in cols:
+        df["href"] = [c[1] if isinstance(c, tuple) else None for c in table["namn"]]
+    else:
+        df["href"] = None
+    return df
+
+
+def scrape_roster_fast(url: str, min_rows: int = 1) -> pd.DataFrame:
+    """Fetch the roster over plain HTTP and parse the server-rendered table.
+    Returns an empty DataFrame if the table is missing (JS-rendered) or can't be parsed.
+    """
+    return _roster_from_html(fetch_html(url), min_rows)
+
+
+async def scrape_roster_http(url: str) -> pd.DataFrame:
+    """Run scrape_roster_fast in a worker thread; an empty DataFrame on any failure."""
+    try:
+        return await asyncio.to_thread(scrape_roster_fast, url)
+    except Exception:
+        return pd.DataFrame()
+
+
+async def scrape_roster(context, url: str) -> pd.DataFrame:
+    # Most roster pages are server-rendered; skip the browser when plain HTTP is enough
+    df = await scrape_roster_http(url)
+    if not df.empty:
+        return df
+    return await scrape_roster_browser(context, url)
+
+
+async def scrape_roster_browser(context, url: str) -> pd.DataFrame:
+    """Load the roster page in ``context`` and parse the rendered table."""
+    async with get_page(context) as page:
+        await page.goto(url, wait_until="domcontentloaded")
+        await accept_cookies(page)
+        # wait for the roster rows themselves instead of network idle + a fixed delay
+        try:
+            await page.wait_for_selector("table tbody tr", timeout=WAIT_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
             pass
-    return False
 
+        # Pull the rendered DOM in one call and parse it locally with pandas
+        return _roster_from_html(await page.content())
 
-def scrape_roster(url: str) -> pd.DataFrame:
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(url, wait_until="networkidle")
-        accept_cookies(page)
-        # wait for potential dynamic content
-        page.wait_for_timeout(800)
 
-        # Find the main roster table and extract all columns
-        table = page.query_selector("table")
-        rows = []
-        if table:
-            # Get headers and clean them for user-friendly names
-            headers = []
-            thead = table.query_selector("thead")
-            if thead:
-                headers = [th.inner_text().strip() for th in thead.query_selector_all("th")]
-            # Clean up header names (remove suffixes/prefixes)
-            import re
-            def clean_header(h):
-                h = h.lower()
-                h = re.sub(r"(expand_less|unfold_more)", "", h)
-                h = h.strip()
-                return h
-            clean_headers = [clean_header(h) for h in headers]
-            idx_map = {h: i for i, h in enumerate(clean_headers)}
-            for tr in table.query_selector_all("tbody tr"):
-                tds = tr.query_selector_all("td")
-                if not tds or len(tds) < 2:
-                    continue
-                cols = [td.inner_text().strip() for td in tds]
-                row = {}
-                for h, i in idx_map.items():
-                    row[h] = cols[i]
-                # Set player_id to number for easier use
-                row["player_id"] = row.get("nr", cols[0])
-                row["name"] = row.get("namn", cols[1])
-                row["position"] = row.get("position", None)
-                # Find player link for href
-                a = tds[idx_map.get("namn", 1)].query_selector("a") if "namn" in idx_map else None
-                row["href"] = a.get_attribute("href") if a else None
-                rows.append(row)
-        browser.close()
-        return pd.DataFrame(rows)
+def _css_escape(s: str) -> str:
+    """Escape a value for use inside a single-quoted CSS attribute selector."""
+    return s.replace("\\", "\\\\").replace("'", "\\'")
 
 
-def scrape_generic_links(url: str, href_contains: str) -> pd.DataFrame:
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(url, wait_until="networkidle")
-        accept_cookies(page)
-        page.wait_for_timeout(800)
-        anchors = page.query_selector_all(f"a[href*='{href_contains}']")
+async def scrape_generic_links(context, url: str, href_contains: str) -> pd.DataFrame:
+    async with get_page(context) as page:
+        await page.goto(url, wait_until="domcontentloaded")
+        await accept_cookies(page)
+        selector = f"a[href*='{_css_escape(href_contains)}']"
+        try:
+            await page.wait_for_selector(selector, timeout=WAIT_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            pass
+        # href + text of every matching anchor in one round-trip
+        anchors = await page.eval_on_selector_all(
+            selector,
+            "els => els.map(a => ({text: (a.innerText || '').trim(), href: a.getAttribute('href') || ''})).filter(r => r.text)",
+        )
         rows = []
         seen = set()
         for a in anchors:
-            try:
-                href = a.get_attribute("href") or ""
-                txt = a.inner_text().strip()
-                if not txt:
-                    continue
-                key = (href, txt)
-                if key in seen:
-                    continue
-                seen.add(key)
-                rows.append({"text": txt, "href": href})
-            except Exception:
+            key = (a["href"], a["text"])
+            if key in seen:
                 continue
-        browser.close()
+            seen.add(key)
+            rows.append(a)
         return pd.DataFrame(rows)
 
 
-if __name__ == "__main__":
-    print("Scraping roster with Playwright (may take a few seconds)...")
+async def scrape_all():
+    """Scrape roster and schedule concurrently, as two pages of the persistent context.
+
+    Returns (roster, links); a failed scrape is returned as its exception.
+    """
+    async with browser_context() as context:
+        return await asyncio.gather(
+            scrape_roster(context, TEAM_TRUPP),
+            scrape_generic_links(context, TEAM_SPELPROGRAM, 'match'),
+            return_exceptions=True,
+        )
+
+
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast integer-looking columns (player_id, stats) to the smallest int dtype."""
+    df = df.copy()
+    for c in df.columns:
+        try:
+            df[c] = pd.to_numeric(df[c], downcast="integer")
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def run_all(compress: bool = False):
+    """Scrape roster and schedule and save CSVs (gzip-compressed .csv.gz if ``compress``)."""
+    ext = ".csv.gz" if compress else ".csv"
+    compression = "gzip" if compress else None
+    print("Scraping roster and schedule anchors with Playwright (may take a few seconds)...")
+    df, df2 = asyncio.run(scrape_all())
+
     try:
-        df = scrape_roster(TEAM_TRUPP)
+        if isinstance(df, Exception):
+            raise df
         if not df.empty:
             print(df.head(20))
-            df.to_csv("trupp_playwright.csv", index=False)
-            print("Saved trupp_playwright.csv")
+            _downcast(df).to_csv(f"trupp_playwright{ext}", index=False, chunksize=10_000, compression=compression)
+            print(f"Saved trupp_playwright{ext}")
         else:
             print("No player anchors found on roster page. You can open the page in a browser and inspect anchors.")
     except Exception as e:
         print("Error scraping roster:", e)
 
-    print("\nScraping schedule anchors (generic links)...")
+    print("\nSchedule anchors (generic links):")
     try:
-        df2 = scrape_generic_links(TEAM_SPELPROGRAM, 'match')
+        if isinstance(df2, Exception):
+            raise df2
         if not df2.empty:
             print(df2.head(20))
-            df2.to_csv("spelprogram_playwright.csv", index=False)
-            print("Saved spelprogram_playwright.csv")
+            df2.to_csv(f"spelprogram_playwright{ext}", index=False, chunksize=10_000, compression=compression)
+            print(f"Saved spelprogram_playwright{ext}")
         else:
             print("No match anchors found on schedule page.")
     except Exception as e:
         print("Error scraping schedule:", e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape roster and schedule with Playwright")
+    parser.add_argument("--gzip", action="store_true", help="Write gzip-compressed .csv.gz files")
+    args = parser.parse_args()
+    run_all(compress=args.gzip)